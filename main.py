@@ -5,9 +5,30 @@ import shutil
 import subprocess
 import json
 import re
+import logging
+import logging.handlers
+import hashlib
+import tempfile
+import functools
+import collections
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-# 延迟导入tkinter，减少启动时间
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ffmpeg-python 只在模块加载时导入一次；未安装时在处理视频时给出提示
+try:
+    import ffmpeg as ffmpeg_lib
+except ImportError:
+    ffmpeg_lib = None
+
+# 延迟导入tkinter，减少启动时间；只在第一次调用时真正导入
+@functools.cache
 def import_tkinter():
     global tk, filedialog, messagebox
     import tkinter as tk
@@ -43,90 +64,183 @@ TARGET_BITRATE_K = 1000
 MIN_BITRATE_K = 516
 ASPECT_RATIO_TOL = 0.01
 
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv")
+
+# ffprobe 结果缓存目录（位于输出文件夹内），重复运行时跳过已探测过的文件
+PROBE_CACHE_DIRNAME = ".ffprobe_cache"
+
+# ffprobe 输出修复用的正则（仅在 JSON 解析失败时使用），模块加载时编译一次
+_RE_CTRL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RE_NONPRINT = re.compile(r'[^\x20-\x7e]')
+_RE_TRAILCOMMA = re.compile(r',\s*([\]}])')
+_RE_OBJECT = re.compile(r'\{[\s\S]*\}')
+
+# 每个 ffmpeg 进程大约占用的 CPU 核数，用于估算并行处理的进程数
+FFMPEG_THREADS_PER_WORKER = 4
+# 每个 ffmpeg 进程的滤镜线程数上限（不超过该进程的编码线程数）
+FILTER_THREADS = 2
+# 使用硬件编码器时的最大并行进程数：消费级显卡同时可用的编码会话有限（NVENC 通常 3～8 路）
+HW_ENCODER_MAX_WORKERS = 2
+# 同时进行的直接复制数：复制受磁盘带宽限制，并发过多会在机械硬盘、网络共享上反复寻道
+COPY_WORKERS = 2
+
+
+# =============== 并行处理与日志输出 ===============
+logger = logging.getLogger("qianchuan_processor")
+
+
+def setup_logging():
+    """主进程：日志统一输出到控制台（重复调用不会重复添加 handler）"""
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%H:%M:%S'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _init_worker(queue):
+    """子进程：日志记录通过队列交给主进程的 QueueListener 统一输出，避免多进程同时写控制台"""
+    logger.handlers[:] = [logging.handlers.QueueHandler(queue)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
 
-def get_video_info(video_path):
+def _pool_workers(encoder=None):
+    """进程池大小：使 并行进程数 × 每个 ffmpeg 的线程数 ≈ CPU 核数；
+    使用硬件编码器时不超过 HW_ENCODER_MAX_WORKERS"""
+    n_workers = max(1, (os.cpu_count() or 1) // FFMPEG_THREADS_PER_WORKER)
+    if encoder and encoder != DEFAULT_VIDEO_ENCODER:
+        n_workers = min(n_workers, HW_ENCODER_MAX_WORKERS)
+    return n_workers
+
+
+def _ffmpeg_threads_per_invocation(n_workers):
+    """每个 ffmpeg 进程的线程数；可通过环境变量 QC_FFMPEG_THREADS 指定，
+    否则按进程池大小平分 CPU 核数，避免多个 ffmpeg 同时开满线程造成过量争用"""
+    env_threads = os.environ.get('QC_FFMPEG_THREADS', '').strip()
+    if env_threads.isdigit() and int(env_threads) > 0:
+        return int(env_threads)
+    return max(1, (os.cpu_count() or 1) // max(1, n_workers))
+
+
+def _probe_workers():
+    """同时进行的 ffprobe 数：单次探测的耗时主要是进程启动，计算量很小，
+    按 CPU 核数并发探测，摊薄每个文件的进程启动开销"""
+    return max(1, os.cpu_count() or 1)
+
+
+def _json_loads(data):
+    """解析 JSON（str 或 bytes），优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj):
+    """序列化为 JSON bytes，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def get_video_info(video_path, cache_dir=None):
+    """获取视频信息；同一文件（路径、大小、修改时间均未变化）只调用一次 ffprobe。
+    指定 cache_dir 时，探测结果同时持久化到磁盘，供下次运行复用"""
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return _probe_video(video_path)
+    return _probe_video_cached(video_path, stat.st_size, stat.st_mtime_ns, cache_dir)
+
+
+@functools.lru_cache(maxsize=256)
+def _probe_video_cached(video_path, size, mtime_ns, cache_dir=None):
+    # size 和 mtime_ns 同时作为缓存键和磁盘缓存的校验信息，文件变化后自动重新探测
+    if cache_dir is None:
+        return _probe_video(video_path)
+
+    cache_file = _probe_cache_file(cache_dir, video_path)
+    info = _load_probe_cache(cache_file, size, mtime_ns)
+    if info is None:
+        info = _probe_video(video_path)
+        if info is not None:
+            _save_probe_cache(cache_file, size, mtime_ns, info)
+    return info
+
+
+def _probe_cache_file(cache_dir, video_path):
+    key = hashlib.sha1(os.fsencode(os.path.abspath(video_path))).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _load_probe_cache(cache_file, size, mtime_ns):
+    """读取磁盘缓存；文件不存在、损坏或大小/修改时间不一致时返回 None"""
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get('size') != size or entry.get('mtime_ns') != mtime_ns:
+        return None
+    return entry.get('info')
+
+
+def _save_probe_cache(cache_file, size, mtime_ns, info):
+    """写入磁盘缓存（先写临时文件再替换，避免并行写入时读到半个文件）；失败时忽略"""
+    tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            f.write(_json_dumps({'size': size, 'mtime_ns': mtime_ns, 'info': info}))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def _probe_video(video_path):
     """使用 ffprobe 获取视频信息（JSON 格式），不依赖 ffmpeg-python 的 probe"""
     try:
         if not os.path.exists(FFPROBE_PATH):
-            print(f"❌ ffprobe 不存在: {FFPROBE_PATH}")
+            logger.error(f"ffprobe 不存在: {FFPROBE_PATH}")
             return None
 
-        # 不使用text=True，手动处理编码，避免gbk解码错误
+        # 不使用text=True，stdout 保持 bytes 直接交给 JSON 解析，避免gbk解码错误和多余的拷贝
+        # 已加 -v quiet，stderr 直接丢弃，不再缓冲；stdin 置空，避免子进程等待输入
+        # 只输出用到的字段：不再导出标签、章节和 side_data，输出更小、解析更快
+        # 流的 bit_rate 缺失时（如 mkv）回退到容器的 bit_rate
         result = subprocess.run([
             FFPROBE_PATH,
             '-v', 'quiet',
             '-print_format', 'json',
-            '-show_streams',
-            '-show_format',
+            '-show_entries', 'stream=codec_type,width,height,r_frame_rate,bit_rate:format=bit_rate',
             video_path
-        ], capture_output=True, check=True)
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
 
-        # 手动解码，使用utf-8并忽略错误
         stdout_bytes = result.stdout
-        stdout_str = stdout_bytes.decode('utf-8', errors='ignore') if stdout_bytes else ''
-        
-        # 清理和修复JSON字符串
-        if not stdout_str:
-            print(f"⚠️ ffprobe 未返回数据: {video_path}")
+        if not stdout_bytes:
+            logger.warning(f"ffprobe 未返回数据: {video_path}")
             return None
-            
-        # 1. 移除可能的BOM（Byte Order Mark）
-        json_str = stdout_str.lstrip('\ufeff')
-        
-        # 2. 移除所有控制字符，只保留制表符、换行符和回车符
-        json_str = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', '', json_str)
-        
-        # 3. 修复JSON解析的核心问题：使用更简单可靠的方法处理ffprobe输出
-        # ffprobe输出的JSON格式问题通常出在字符串值中包含特殊字符
+
         try:
-            # 尝试直接解析原始JSON
-            probe_data = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            # 解析失败，尝试更严格的清理
-            print(f"⚠️ 原始JSON解析失败，尝试修复: {video_path}")
-            
-            # 修复1: 移除所有可能导致问题的特殊字符，只保留ASCII可打印字符
-            json_str = re.sub(r'[^\x20-\x7e]', '', json_str)
-            
-            # 修复2: 修复未转义的引号 - 使用更精确的正则表达式
-            # 匹配键值对中的字符串值，确保只替换值内的未转义引号
-            json_str = re.sub(r'"([^"]*?)(?<!\\)"', lambda m: '"' + m.group(1).replace('"', '\\"') + '"', json_str)
-            
-            # 修复3: 修复可能的尾随逗号
-            json_str = re.sub(r',\s*([\]}])', r'\1', json_str)
-            
-            # 修复4: 确保JSON只包含一个顶级对象
-            # 有些ffprobe输出可能包含额外内容，只保留第一个完整的JSON对象
-            json_match = re.search(r'\{[\s\S]*?\}', json_str)
-            if json_match:
-                json_str = json_match.group(0)
-            
-            try:
-                # 再次尝试解析修复后的JSON
-                probe_data = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                # 仍然解析失败，打印详细错误信息
-                print(f"❌ JSON修复后仍解析失败: {video_path}")
-                print(f"   错误位置: 行 {e.lineno}, 列 {e.colno}")
-                print(f"   错误信息: {e.msg}")
-                # 打印出错位置附近的内容
-                lines = json_str.split('\n')
-                if e.lineno <= len(lines):
-                    start = max(0, e.lineno - 2)
-                    end = min(len(lines), e.lineno + 1)
-                    print(f"   上下文 ({start+1}-{end}行):")
-                    for i in range(start, end):
-                        line = lines[i]
-                        marker = "--->" if i == e.lineno - 1 else "    "
-                        print(f"   {marker} {i+1}: {line}")
-                        if i == e.lineno - 1:
-                            print(f"   {marker}      {' '*(e.colno-1)}^ 错误位置")
+            # ffprobe 输出的是标准 JSON，直接解析 bytes，省去解码和清理
+            probe_data = _json_loads(stdout_bytes)
+        except ValueError:
+            # 直接解析失败（如包含非法编码），才走清理和修复流程
+            probe_data = _repair_probe_json(stdout_bytes, video_path)
+            if probe_data is None:
                 return None
+
         video_stream = None
         has_audio = False
         for stream in probe_data.get('streams', []):
             if stream.get('codec_type') == 'video':
-                video_stream = stream
+                # 以第一路视频流为准（与 ffmpeg 的 v:0 一致）
+                if video_stream is None:
+                    video_stream = stream
             elif stream.get('codec_type') == 'audio':
                 has_audio = True
 
@@ -137,8 +251,10 @@ def get_video_info(video_path):
         height = int(video_stream.get('height', 0))
         r_frame_rate = video_stream.get('r_frame_rate', '30/1')
         try:
-            fps = eval(r_frame_rate) if '/' in r_frame_rate else float(r_frame_rate)
-        except:
+            # r_frame_rate 形如 "30000/1001"，按分数解析，不使用 eval
+            num, _, den = r_frame_rate.partition('/')
+            fps = int(num) / int(den) if den else float(num)
+        except (ValueError, ZeroDivisionError):
             fps = 30.0
 
         bitrate_str = video_stream.get('bit_rate') or probe_data.get('format', {}).get('bit_rate')
@@ -152,10 +268,60 @@ def get_video_info(video_path):
             'has_audio': has_audio
         }
     except subprocess.CalledProcessError as e:
-        print(f"⚠️ ffprobe 执行失败 {video_path}: {e}")
+        logger.warning(f"ffprobe 执行失败 {video_path}: {e}")
         return None
     except Exception as e:
-        print(f"⚠️ 无法解析视频信息 {video_path}: {e}")
+        logger.warning(f"无法解析视频信息 {video_path}: {e}")
+        return None
+
+
+def _repair_probe_json(stdout_bytes, video_path):
+    """ffprobe 输出无法直接解析时的清理和修复流程，仍失败时返回 None"""
+    # 手动解码，使用utf-8并忽略错误，并移除可能的BOM（Byte Order Mark）
+    json_str = stdout_bytes.decode('utf-8', errors='ignore').lstrip('\ufeff')
+
+    # 移除所有控制字符，只保留制表符、换行符和回车符
+    json_str = _RE_CTRL.sub('', json_str)
+    try:
+        return _json_loads(json_str)
+    except json.JSONDecodeError:
+        logger.warning(f"原始JSON解析失败，尝试修复: {video_path}")
+
+    # 修复1: 移除所有可能导致问题的特殊字符，只保留ASCII可打印字符
+    json_str = _RE_NONPRINT.sub('', json_str)
+
+    # 修复2: 修复可能的尾随逗号
+    json_str = _RE_TRAILCOMMA.sub(r'\1', json_str)
+
+    # 修复3: 确保JSON只包含一个顶级对象
+    # 有些ffprobe输出可能包含额外内容，只保留从第一个 { 到最后一个 } 之间的内容
+    json_match = _RE_OBJECT.search(json_str)
+    if json_match:
+        json_str = json_match.group(0)
+
+    try:
+        # 再次尝试解析修复后的JSON
+        return _json_loads(json_str)
+    except json.JSONDecodeError as e:
+        # 仍然解析失败，输出详细错误信息（合并为一条日志，避免与其他进程的输出交错）
+        details = [
+            f"JSON修复后仍解析失败: {video_path}",
+            f"   错误位置: 行 {e.lineno}, 列 {e.colno}",
+            f"   错误信息: {e.msg}",
+        ]
+        # 出错位置附近的内容
+        lines = json_str.split('\n')
+        if e.lineno <= len(lines):
+            start = max(0, e.lineno - 2)
+            end = min(len(lines), e.lineno + 1)
+            details.append(f"   上下文 ({start+1}-{end}行):")
+            for i in range(start, end):
+                line = lines[i]
+                marker = "--->" if i == e.lineno - 1 else "    "
+                details.append(f"   {marker} {i+1}: {line}")
+                if i == e.lineno - 1:
+                    details.append(f"   {marker}      {' '*(e.colno-1)}^ 错误位置")
+        logger.error('\n'.join(details))
         return None
 
 
@@ -170,85 +336,250 @@ def is_valid_aspect_ratio(w, h):
     return abs(ratio - target_ratio) <= ASPECT_RATIO_TOL
 
 
-def process_video(input_path, output_path):
-    info = get_video_info(input_path)
-    if not info:
-        print(f"❌ 跳过无效视频: {input_path}")
-        return
+# 处理方式
+ACTION_COPY = 'copy'            # 符合要求，直接复制
+ACTION_REENCODE = 'reencode'    # 画面符合要求、仅码率不足，按原尺寸重新编码
+ACTION_TRANSCODE = 'transcode'  # 缩放裁剪并重新编码
 
-    w, h = info['width'], info['height']
-    bitrate = info['bitrate_kbps']
 
+def plan_video(info):
+    """根据视频信息决定处理方式；信息无效时返回 None"""
+    if not info or info['width'] <= 0 or info['height'] <= 0:
+        return None
+
+    w, h = info['width'], info['height']
     aspect_ok = is_valid_aspect_ratio(w, h)
     res_ok = is_valid_resolution(w, h)
-    bitrate_ok = bitrate >= MIN_BITRATE_K
-
-    if aspect_ok and res_ok and bitrate_ok:
-        print(f"✅ 符合要求，直接复制: {input_path}")
+    bitrate_ok = info['bitrate_kbps'] >= MIN_BITRATE_K
+
+    if aspect_ok and res_ok:
+        if bitrate_ok:
+            return ACTION_COPY
+        # yuv420p 的 H.264 编码要求宽高为偶数，奇数尺寸（如 721x1282）无法按原尺寸重新编码，
+        # 需走缩放裁剪到目标尺寸的流程
+        if w % 2 == 0 and h % 2 == 0:
+            return ACTION_REENCODE
+    return ACTION_TRANSCODE
+
+
+def output_names_for(videos, input_dir):
+    """为每个输入视频确定输出文件名。输出统一放在一个文件夹中，不同子文件夹里的同名文件
+    改用相对路径作为文件名（如 a/1.mp4 → a_1.mp4），避免并行处理时写入同一个输出文件"""
+    counts = collections.Counter(os.path.normcase(os.path.basename(v)) for v in videos)
+    names = {}
+    for video_path in videos:
+        name = os.path.basename(video_path)
+        if counts[os.path.normcase(name)] > 1:
+            name = os.path.relpath(video_path, input_dir).replace(os.sep, '_')
+        names[video_path] = name
+    return names
+
+
+def unique_output_path(output_path, taken):
+    """输出路径已被本次运行中的其他视频占用时，在文件名后追加序号；返回的路径记入 taken"""
+    stem, suffix = os.path.splitext(output_path)
+    candidate, n = output_path, 1
+    while os.path.normcase(candidate) in taken:
+        n += 1
+        candidate = f"{stem}_{n}{suffix}"
+    taken.add(os.path.normcase(candidate))
+    return candidate
+
+
+def output_path_for(video_path, info, output_dir, name=None):
+    """生成输出文件路径；没有音频的视频在文件名后添加醒目标识"""
+    name = name or os.path.basename(video_path)
+    has_audio = info.get('has_audio', True) if info else True
+    if has_audio:
+        return os.path.join(output_dir, name)
+
+    # 没有音频，在文件名后添加醒目标识（重复两遍+Windows允许的符号）
+    stem, suffix = os.path.splitext(name)
+    output_filename = f"{stem}_【无音频】【无音频】{suffix}"
+    logger.info(f"检测到无音频视频: {name}")
+    logger.info(f"将添加标识并重命名为: {output_filename}")
+    return os.path.join(output_dir, output_filename)
+
+
+# =============== 编码器选择 ===============
+# 按优先级排列的 H.264 编码器：(编码器, 输入参数, 输出参数)
+# 硬件解码只加 -hwaccel，不指定 -hwaccel_output_format，解码后的帧自动回到内存，
+# 以便继续使用 scale/crop/fps 等 CPU 滤镜
+VIDEO_ENCODERS = (
+    ('h264_nvenc', {'hwaccel': 'cuda'}, {'preset': 'p4', 'rc': 'vbr'}),
+    ('h264_qsv', {}, {'preset': 'fast'}),
+    ('h264_videotoolbox', {'hwaccel': 'videotoolbox'}, {}),
+    ('libx264', {}, {'preset': 'fast'}),
+)
+DEFAULT_VIDEO_ENCODER = 'libx264'
+
+
+@functools.lru_cache(maxsize=None)
+def detect_video_encoder():
+    """选择可用的 H.264 编码器：优先硬件编码，都不可用时回退到 libx264。
+    可通过环境变量 QC_VIDEO_ENCODER 强制指定；结果在进程内缓存"""
+    known = [name for name, _, _ in VIDEO_ENCODERS]
+    forced = os.environ.get('QC_VIDEO_ENCODER', '').strip()
+    if forced in known:
+        return forced
+
+    if not os.path.exists(FFMPEG_PATH):
+        return DEFAULT_VIDEO_ENCODER
+    try:
+        result = subprocess.run([FFMPEG_PATH, '-hide_banner', '-encoders'],
+                                capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return DEFAULT_VIDEO_ENCODER
+
+    listed = set()
+    for line in result.stdout.decode('utf-8', errors='ignore').splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            listed.add(parts[1])
+
+    # ffmpeg 编译了硬件编码器不代表本机有对应硬件，需实际试编码一帧确认
+    for name in known:
+        if name == DEFAULT_VIDEO_ENCODER:
+            break
+        if name in listed and _encoder_works(name):
+            return name
+    return DEFAULT_VIDEO_ENCODER
+
+
+def _encoder_works(encoder):
+    """用与正式处理相同的参数（硬件解码、像素格式、码率控制、缩放裁剪）试转码一段样片"""
+    if ffmpeg_lib is None:
+        return False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 先用 libx264 生成一段横屏 H.264 样片，使试转码也经过硬件解码和缩放裁剪
+        sample = os.path.join(tmp_dir, 'sample.mp4')
+        try:
+            subprocess.run([
+                FFMPEG_PATH,
+                '-hide_banner', '-v', 'error',
+                '-f', 'lavfi', '-i', 'testsrc2=s=1920x1080:r=30:d=1',
+                '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+                '-y', sample
+            ], capture_output=True, check=True, timeout=60)
+            cmd = _build_encode(sample, os.path.join(tmp_dir, 'out.mp4'),
+                                ACTION_TRANSCODE, encoder).compile(cmd=FFMPEG_PATH)
+            result = subprocess.run(cmd, capture_output=True, timeout=60)
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            return False
+    return result.returncode == 0
+
+
+def _encoder_options(encoder):
+    """返回编码器对应的 (输入参数, 输出参数)"""
+    for name, input_opts, output_opts in VIDEO_ENCODERS:
+        if name == encoder:
+            return dict(input_opts), dict(output_opts)
+    return {}, {}
+
+
+def process_video(input_path, output_path, n_threads=None, info=None, encoder=None):
+    """处理单个视频（直接复制或转码），成功返回 True，跳过或失败返回 False"""
+    if info is None:
+        info = get_video_info(input_path)
+    action = plan_video(info)
+    if action is None:
+        logger.error(f"跳过无效视频: {input_path}")
+        return False
+
+    if action == ACTION_COPY:
+        return copy_video(input_path, output_path)
+
+    if ffmpeg_lib is None:
+        logger.error("未安装 ffmpeg-python，无法处理视频")
+        return False
+
+    encoder = encoder or detect_video_encoder()
+    logger.info(f"正在处理: {input_path} → {output_path}")
+
+    # 硬件编码器在个别文件上失败时（编码会话数超限、不支持的源格式等），改用 libx264 重试一次
+    attempts = [encoder] if encoder == DEFAULT_VIDEO_ENCODER else [encoder, DEFAULT_VIDEO_ENCODER]
+    for attempt in attempts:
         try:
-            shutil.copy2(input_path, output_path)
+            _build_encode(input_path, output_path, action, attempt, n_threads).run(cmd=FFMPEG_PATH, quiet=True)
+            logger.info(f"完成: {output_path}")
+            return True
         except Exception as e:
-            print(f"❌ 复制失败: {e}")
-        return
-
-    # 延迟导入ffmpeg，减少启动时间
-    try:
-        import ffmpeg as ffmpeg_lib
-    except ImportError:
-        print("❌ 未安装 ffmpeg-python，无法处理视频")
-        return
-
-    src_w, src_h = w, h
-    target_w, target_h = TARGET_WIDTH, TARGET_HEIGHT
+            if attempt != DEFAULT_VIDEO_ENCODER:
+                logger.warning(f"{attempt} 编码失败，改用 {DEFAULT_VIDEO_ENCODER} 重试 {input_path}: {e}")
+            else:
+                logger.error(f"处理失败 {input_path}: {e}")
+    return False
+
+
+def _build_encode(input_path, output_path, action, encoder, n_threads=None):
+    """按处理方式和编码器构建 ffmpeg 命令（正式处理和编码器检测共用同一套参数）"""
+    input_opts, encoder_opts = _encoder_options(encoder)
+    input_stream = ffmpeg_lib.input(input_path, **input_opts)
+
+    # 只处理第一路视频流（与探测时一致），避免封面图等附加视频流也被重新编码
+    video = input_stream['v:0']
+    output_opts = {
+        'vcodec': encoder,
+        'video_bitrate': f'{TARGET_BITRATE_K}k',
+        'pix_fmt': 'yuv420p',
+        **encoder_opts
+    }
+
+    # 画面比例和分辨率已符合要求、只是码率不足时（ACTION_REENCODE），无需缩放裁剪，
+    # 按原尺寸重新编码到目标码率（直接流复制无法提高码率，所以仍需重新编码）
+    if action == ACTION_TRANSCODE:
+        # 等比缩放到刚好铺满目标尺寸 → 居中裁剪 → 统一帧率，合并为一条滤镜链
+        output_opts['vf'] = (
+            f'scale={TARGET_WIDTH}:{TARGET_HEIGHT}:force_original_aspect_ratio=increase,'
+            f'crop={TARGET_WIDTH}:{TARGET_HEIGHT},'
+            f'fps={TARGET_FPS}'
+        )
 
-    scale_w = target_w
-    scale_h = int(src_h * (target_w / src_w))
-    if scale_h < target_h:
-        scale_h = target_h
-        scale_w = int(src_w * (target_h / src_h))
+    if n_threads:
+        output_opts['threads'] = str(n_threads)
+    filter_threads = min(FILTER_THREADS, n_threads) if n_threads else FILTER_THREADS
 
-    x = max(0, (scale_w - target_w) // 2)
-    y = max(0, (scale_h - target_h) // 2)
+    # 处理音频：保留第一路音频并直接流复制，不做解码和重新编码；
+    # "a:0?" 表示没有音频时忽略该映射，无需单独区分有无音频
+    audio = input_stream['a:0?']
+    output_opts['acodec'] = 'copy'
 
-    input_stream = ffmpeg_lib.input(input_path)
-    video = (
-        input_stream
-        .filter('scale', scale_w, scale_h)
-        .filter('crop', target_w, target_h, x, y)
+    return (
+        ffmpeg_lib
+        .output(video, audio, output_path, **output_opts)
+        .global_args('-filter_threads', str(filter_threads))
+        .overwrite_output()
     )
 
-    if not bitrate_ok or not aspect_ok or not res_ok:
-        video = video.filter('fps', fps=TARGET_FPS)
-        output_opts = {
-            'vcodec': 'libx264',
-            'video_bitrate': f'{TARGET_BITRATE_K}k',
-            'preset': 'fast',
-            'pix_fmt': 'yuv420p'
-        }
-    else:
-        output_opts = {}
 
-    # 处理音频：如果原视频有音频，保留音频轨道
-    has_audio = info.get('has_audio', False)
-    if has_audio:
-        # 保留音频轨道，不做转码处理
-        audio = input_stream.audio
-        output_args = [video, audio, output_path]
-    else:
-        # 没有音频，只处理视频轨道
-        output_args = [video, output_path]
-
-    print(f"🔄 正在处理: {input_path} → {output_path}")
+def copy_video(input_path, output_path):
+    """直接复制符合要求的视频，成功返回 True"""
+    logger.info(f"符合要求，直接复制: {input_path}")
     try:
-        (
-            ffmpeg_lib
-            .output(*output_args, **output_opts)
-            .overwrite_output()
-            .run(cmd=FFMPEG_PATH, quiet=True)
-        )
-        print(f"✔️ 完成: {output_path}")
+        shutil.copy2(input_path, output_path)
+        return True
     except Exception as e:
-        print(f"❌ 处理失败 {input_path}: {e}")
+        logger.error(f"复制失败 {input_path}: {e}")
+        return False
+
+
+def iter_video_files(root_dir):
+    """递归遍历文件夹，按扩展名筛选视频文件，返回路径字符串。
+    先比对文件名再判断类型，非视频文件不会产生额外的 stat 调用"""
+    pending = [os.fspath(root_dir)]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            # 无权限等无法读取的子文件夹直接跳过
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.lower().endswith(VIDEO_EXTENSIONS) and entry.is_file():
+                    yield entry.path
+                elif entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
 
 
 def process_all_videos(input_dir: Path, output_dir: Path):
@@ -258,44 +589,95 @@ def process_all_videos(input_dir: Path, output_dir: Path):
         return
 
     output_dir.mkdir(parents=True, exist_ok=True)
+    setup_logging()
 
-    video_extensions = {".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv"}
-    videos = [f for f in input_dir.rglob("*") if f.suffix.lower() in video_extensions]
+    videos = list(iter_video_files(input_dir))
 
     if not videos:
         messagebox.showinfo("提示", "输入文件夹中没有找到视频文件！")
         return
 
-    for video_file in videos:
-        # 先获取视频信息，检查是否有音频
-        video_info = get_video_info(str(video_file))
-        has_audio = video_info.get('has_audio', True) if video_info else True
-        
-        # 生成输出文件名
-        if has_audio:
-            output_file = output_dir / video_file.name
-        else:
-            # 没有音频，在文件名后添加醒目标识（重复两遍+Windows允许的符号）
-            output_filename = f"{video_file.stem}_【无音频】【无音频】{video_file.suffix}"
-            output_file = output_dir / output_filename
-            print(f"🔇 检测到无音频视频: {video_file.name}")
-            print(f"📝 将添加标识并重命名为: {output_filename}")
-            
-        print(f"\n--- 处理: {video_file.name} ---")
-        process_video(str(video_file), str(output_file))
+    output_names = output_names_for(videos, str(input_dir))
+    taken_outputs = set()
 
-    import_tkinter()
-    messagebox.showinfo("完成", f"所有视频处理完毕！\n共处理 {len(videos)} 个文件。")
+    # 编码器只在主进程检测一次，再传给各个子进程
+    encoder = detect_video_encoder()
+    logger.info(f"视频编码器: {encoder}")
+
+    cache_dir = str(output_dir / PROBE_CACHE_DIRNAME)
+    n_workers = _pool_workers(encoder)
+    n_threads = _ffmpeg_threads_per_invocation(n_workers)
+    n_probes = _probe_workers()
+    logger.info(f"并行处理进程数: {n_workers}，每个 ffmpeg 线程数: {n_threads}，并发探测数: {n_probes}")
+
+    # 进程池统一使用 spawn 方式启动子进程（Windows/macOS 默认即是如此）：主进程中有探测线程
+    # 同时在启动 ffprobe，若用 fork 复制进程会继承这些线程持有的管道，导致探测卡住
+    mp_context = multiprocessing.get_context('spawn')
+
+    # 子进程的日志经队列交给主进程的 QueueListener，由同一组 handler 统一输出
+    log_queue = mp_context.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    listener.start()
+
+    succeeded = failed = skipped = 0
+    try:
+        with ThreadPoolExecutor(max_workers=n_probes) as probe_pool, \
+                ThreadPoolExecutor(max_workers=COPY_WORKERS) as copy_pool, \
+                ProcessPoolExecutor(max_workers=n_workers,
+                                    mp_context=mp_context,
+                                    initializer=_init_worker,
+                                    initargs=(log_queue,)) as pool:
+            # 探测主要是等待 ffprobe 子进程，放在线程池中提前进行；每探测完一个就立即安排
+            # 复制或转码，让后续视频的探测与当前的转码重叠，而不是逐个串行
+            probes = {probe_pool.submit(get_video_info, video_path, cache_dir): video_path
+                      for video_path in videos}
+            jobs = {}
+            for probe in as_completed(probes):
+                video_path = probes[probe]
+                info = probe.result()
+                action = plan_video(info)
+                if action is None:
+                    logger.error(f"跳过无效视频: {video_path}")
+                    skipped += 1
+                    continue
+
+                output_path = output_path_for(video_path, info, str(output_dir), output_names[video_path])
+                output_path = unique_output_path(output_path, taken_outputs)
+                if action == ACTION_COPY:
+                    # 直接复制是 I/O 操作，放在单独的小线程池中：不占用转码进程，
+                    # 也不必排在全部探测之后
+                    job = copy_pool.submit(copy_video, video_path, output_path)
+                else:
+                    job = pool.submit(process_video, video_path, output_path,
+                                      n_threads=n_threads, info=info, encoder=encoder)
+                jobs[job] = video_path
+
+            for job in as_completed(jobs):
+                try:
+                    ok = job.result()
+                except Exception as e:
+                    ok = False
+                    logger.error(f"处理异常 {os.path.basename(jobs[job])}: {e}")
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+    finally:
+        listener.stop()
+
+    summary = f"所有视频处理完毕！\n共 {len(videos)} 个文件，成功 {succeeded} 个。"
+    if failed:
+        summary += f"\n处理失败 {failed} 个。"
+    if skipped:
+        summary += f"\n无效视频已跳过 {skipped} 个。"
+    if failed or skipped:
+        summary += "\n详情请查看控制台输出。"
+    messagebox.showinfo("完成", summary)
 
 
 # =============== GUI ===============
-def select_folder(title):
-    import_tkinter()
-    root = tk.Tk()
-    root.withdraw()
-    folder = filedialog.askdirectory(title=title)
-    root.destroy()
-    return folder
+def select_folder(root, title):
+    return filedialog.askdirectory(parent=root, title=title)
 
 
 def main_gui():
@@ -314,21 +696,30 @@ def main_gui():
         "│  ⏳ 正在启动工具...                              \n"
         "└────────────────────────────────────────────────┘"
     )
-    input_folder = select_folder("请选择输入视频文件夹")
-    if not input_folder:
-        print("未选择输入文件夹，退出。")
-        return
+    # 整个运行过程共用一个隐藏的 Tk 根窗口（对话框和提示框都挂在它上面），退出时统一销毁
+    import_tkinter()
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        input_folder = select_folder(root, "请选择输入视频文件夹")
+        if not input_folder:
+            print("未选择输入文件夹，退出。")
+            return
 
-    output_folder = select_folder("请选择输出视频文件夹")
-    if not output_folder:
-        print("未选择输出文件夹，退出。")
-        return
+        output_folder = select_folder(root, "请选择输出视频文件夹")
+        if not output_folder:
+            print("未选择输出文件夹，退出。")
+            return
 
-    print(f"输入: {input_folder}")
-    print(f"输出: {output_folder}")
+        print(f"输入: {input_folder}")
+        print(f"输出: {output_folder}")
 
-    process_all_videos(Path(input_folder), Path(output_folder))
+        process_all_videos(Path(input_folder), Path(output_folder))
+    finally:
+        root.destroy()
 
 
 if __name__ == "__main__":
+    # 打包为 exe 后，进程池的子进程需要 freeze_support 才能正常启动
+    multiprocessing.freeze_support()
     main_gui()
\ No newline at end of file